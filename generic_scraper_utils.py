@@ -3,7 +3,13 @@ import time
 import os
 import datetime
 import traceback
-from shutil import which
+import argparse
+import json
+import re
+import csv
+import heapq
+import tempfile
+from shutil import which, rmtree
 
 # Selenium関連のインポート
 from selenium import webdriver
@@ -18,6 +24,12 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException,
 DEFAULT_PAGE_LOAD_TIMEOUT = 15 # Seleniumの要素待機タイムアウト（秒）
 DEFAULT_REQUEST_WAIT_TIME = 2  # ページ遷移後などの待機時間（秒）
 DEFAULT_OUTPUT_DIR_NAME = "output_generic" # 出力先ディレクトリ名 (デフォルト)
+DEFAULT_CACHE_DIR_NAME = "page_cache" # ページキャッシュの保存先ディレクトリ名 (デフォルト)
+DEFAULT_CACHE_MAX_BYTES = 500 * 1024 * 1024 # ページキャッシュの最大合計サイズ（バイト）
+CACHE_STAGING_DIR_NAME = ".recording" # 記録中のページを一時保存するディレクトリ名 (cache_dir 直下)
+CACHE_MANIFEST_FILENAME = "manifest.json" # 記録完了したキャッシュキーのページ数などを保存するファイル名
+DEFAULT_MERGE_CHUNK_ROWS = 100000 # 外部マージ時に一度にメモリへ読み込む最大行数
+DEFAULT_MERGE_MAX_OPEN_RUNS = 64 # 外部マージ時に同時に開くソート済み一時ファイルの最大数
 
 # --- WebDriver関連 ---
 def setup_webdriver(headless=False, window_size='1200,900', lang='ja-JP', detach=False):
@@ -131,6 +143,176 @@ def convert_csv_to_excel(csv_filepath, excel_filepath, columns_order=None):
         traceback.print_exc()
     return False
 
+# --- 外部マージ (大規模CSVの統合・重複排除) 関連 ---
+def _read_csv_header(csv_filepath):
+    """CSVファイルのヘッダー行だけを読み込んで返す。"""
+    with open(csv_filepath, newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f), [])
+
+def _iter_run_rows(run_path):
+    """ソート済み一時ファイル (ヘッダーなしCSV) の行を1行ずつ返す。"""
+    with open(run_path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            yield row
+
+def _write_run(rows, run_path):
+    """行のイテラブルをソート済み一時ファイルに書き出し、書き出した行数を返す。"""
+    count = 0
+    with open(run_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+def _dedup_sorted_rows(rows, key_idx, order_idx, order_func):
+    """
+    キー列でソート済みの行から、キーごとに順序値が最大の行だけを返す。
+    順序値が同じ場合は後に現れた行を優先する。
+    """
+    current_key, best_row, best_order = None, None, None
+    for row in rows:
+        key = row[key_idx]
+        order = order_func(row[order_idx]) if order_idx is not None else None
+        order = order or ''
+        if best_row is not None and key != current_key:
+            yield best_row
+            best_row = None
+        if best_row is None or order >= best_order:
+            current_key, best_row, best_order = key, row, order
+    if best_row is not None:
+        yield best_row
+
+def _write_merged_rows(rows, output_path, columns, output_format, batch_rows):
+    """マージ済みの行をCSVまたはParquetファイルに書き出し、書き出した行数を返す。"""
+    count = 0
+    if output_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([(col, pa.string()) for col in columns])
+
+        def flush(batch):
+            table = pa.table({col: [row[i] for row in batch] for i, col in enumerate(columns)}, schema=schema)
+            writer.write_table(table)
+
+        with pq.ParquetWriter(output_path, schema) as writer:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_rows:
+                    flush(batch)
+                    count += len(batch)
+                    batch = []
+            if batch or count == 0:
+                flush(batch)
+                count += len(batch)
+    else:
+        with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+    return count
+
+def external_merge_dedup(input_paths, output_path, key_column, order_column=None, order_func=None,
+                         output_format='csv', chunk_rows=DEFAULT_MERGE_CHUNK_ROWS,
+                         max_open_runs=DEFAULT_MERGE_MAX_OPEN_RUNS, tmp_dir=None):
+    """
+    複数のCSVファイルを外部マージソートで統合し、キー列で重複排除した1つのファイルを出力する。
+    入力は chunk_rows 行ずつ読み込んでソート済み一時ファイルに分割するため、使用メモリは入力サイズに依存しない。
+    input_paths: 入力CSVファイルパスのリスト
+    key_column: 重複排除とソートに使うキー列
+    order_column: 重複時に残す行を決める列。値が最大の行を残す (任意)
+    order_func: order_column の値を比較可能な文字列に変換する関数 (任意)
+    output_format: 'csv' または 'parquet' ('parquet' の場合は pyarrow が必要)
+    chunk_rows: 一度にメモリへ読み込む最大行数 (1以上)
+    max_open_runs: 同時に開く一時ファイルの最大数 (2以上)。超える場合は多段でマージする
+    戻り値: 出力した行数。失敗した場合は None
+    """
+    if chunk_rows < 1:
+        print(f"エラー: chunk_rows は1以上を指定してください。({chunk_rows})")
+        return None
+    if max_open_runs < 2:
+        print(f"エラー: max_open_runs は2以上を指定してください。({max_open_runs})")
+        return None
+    if output_format not in ('csv', 'parquet'):
+        print(f"エラー: 未対応の出力形式です。'{output_format}' (csv または parquet)")
+        return None
+    if output_format == 'parquet':
+        # 入力の読み込み・ソートを始める前に、出力に必要なライブラリがあるか確認する
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("'pyarrow' ライブラリが見つかりません。Parquet出力にはpyarrowをインストールしてください。")
+            return None
+
+    if order_func is None:
+        order_func = lambda value: value
+
+    columns = []
+    for path in input_paths:
+        if not os.path.exists(path):
+            print(f"エラー: 入力ファイルが見つかりません。'{path}'")
+            return None
+        for col in _read_csv_header(path):
+            if col not in columns:
+                columns.append(col)
+    if key_column not in columns:
+        print(f"エラー: キー列 '{key_column}' が入力ファイルに存在しません。")
+        return None
+    key_idx = columns.index(key_column)
+    order_idx = columns.index(order_column) if order_column in columns else None
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="merge_runs_", dir=tmp_dir) as run_dir:
+            # --- 1段目: 入力を chunk_rows 行ずつ読み込み、キー順にソートした一時ファイルを作成 ---
+            runs = []
+            total_rows, skipped_rows = 0, 0
+            for path in input_paths:
+                print(f"読み込み中: '{path}'")
+                reader = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig', chunksize=chunk_rows)
+                for chunk in reader:
+                    total_rows += len(chunk)
+                    chunk = chunk.reindex(columns=columns, fill_value='')
+                    missing_key = chunk[key_column] == ''
+                    skipped_rows += int(missing_key.sum())
+                    chunk = chunk[~missing_key].sort_values(key_column, kind='mergesort')
+                    run_path = os.path.join(run_dir, f"run_{len(runs):06d}.csv")
+                    rows = _dedup_sorted_rows(chunk.itertuples(index=False, name=None), key_idx, order_idx, order_func)
+                    _write_run(rows, run_path)
+                    runs.append(run_path)
+            print(f"{total_rows} 行を {len(runs)} 個の一時ファイルに分割しました。")
+            if skipped_rows:
+                print(f"キー列 '{key_column}' が空の {skipped_rows} 行はスキップしました。")
+
+            # --- 2段目: 一時ファイル数が上限を超える間は、連続する一時ファイルをまとめてマージ ---
+            merge_pass = 0
+            while len(runs) > max_open_runs:
+                merge_pass += 1
+                next_runs = []
+                for i in range(0, len(runs), max_open_runs):
+                    group = runs[i:i + max_open_runs]
+                    run_path = os.path.join(run_dir, f"pass{merge_pass}_{len(next_runs):06d}.csv")
+                    merged = heapq.merge(*[_iter_run_rows(r) for r in group], key=lambda row: row[key_idx])
+                    _write_run(_dedup_sorted_rows(merged, key_idx, order_idx, order_func), run_path)
+                    for r in group:
+                        os.remove(r)
+                    next_runs.append(run_path)
+                runs = next_runs
+                print(f"マージ {merge_pass} 段目完了: 一時ファイル {len(runs)} 個")
+
+            # --- 最終段: 全ての一時ファイルをマージして出力 ---
+            merged = heapq.merge(*[_iter_run_rows(r) for r in runs], key=lambda row: row[key_idx])
+            written = _write_merged_rows(_dedup_sorted_rows(merged, key_idx, order_idx, order_func),
+                                         output_path, columns, output_format, chunk_rows)
+        print(f"統合完了: {total_rows} 行 -> {written} 行 (重複排除後) を '{output_path}' に出力しました。")
+        return written
+    except Exception as e:
+        print(f"ファイル統合中にエラーが発生しました: {e}")
+        traceback.print_exc()
+    return None
+
 # --- ファイル・ディレクトリ操作 ---
 def ensure_output_dir(dir_name):
     """
@@ -153,6 +335,205 @@ def delete_file_if_exists(filepath):
             return False
     return True
 
+# --- ページキャッシュ (記録/再生) 関連 ---
+def cache_key_dir_name(cache_key):
+    """
+    キャッシュキー（検索条件名）をディレクトリ名に変換する。ファイル名に使えない文字は '_' に置換する。
+    空のキーや '.' で始まるキー ('.', '..' など) は cache_dir の外や一時ディレクトリを指すため ValueError とする。
+    """
+    safe_key = re.sub(r'[^\w\-.]', '_', str(cache_key))
+    if not safe_key or safe_key.startswith('.'):
+        raise ValueError(f"キャッシュキーとして使用できません: '{cache_key}' (空、または '.' で始まるキーは不可)")
+    return safe_key
+
+def _cache_key_dir(cache_dir, cache_key):
+    """キャッシュキーに対応する記録済みページのディレクトリパスを返す。"""
+    return os.path.join(cache_dir, cache_key_dir_name(cache_key))
+
+def _cache_staging_dir(cache_dir, cache_key):
+    """キャッシュキーに対応する記録中ページの一時ディレクトリパスを返す。"""
+    return os.path.join(cache_dir, CACHE_STAGING_DIR_NAME, cache_key_dir_name(cache_key))
+
+def _cache_page_basename(page_num):
+    return f"page_{int(page_num):04d}"
+
+def start_cache_recording(cache_dir, cache_key):
+    """
+    キャッシュの記録を開始する。記録中のページは一時ディレクトリに保存され、
+    finish_cache_recording() が呼ばれるまで既存の記録済みページは変更されない。
+    """
+    staging_dir = _cache_staging_dir(cache_dir, cache_key)
+    if os.path.isdir(staging_dir):
+        rmtree(staging_dir)
+    os.makedirs(staging_dir, exist_ok=True)
+
+def save_page_to_cache(cache_dir, cache_key, page_num, html, metadata=None):
+    """
+    取得したページのHTMLとメタデータを記録中の一時ディレクトリに保存する。
+    cache_key: 検索条件を識別する名前
+    page_num: ページ番号 (1始まり)
+    metadata: HTMLと一緒に保存する辞書 (URLなど, 任意)
+    """
+    base_path = os.path.join(_cache_staging_dir(cache_dir, cache_key), _cache_page_basename(page_num))
+    html_path, meta_path = base_path + ".html", base_path + ".json"
+    try:
+        os.makedirs(os.path.dirname(html_path), exist_ok=True)
+        with open(html_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        meta = dict(metadata or {})
+        meta['cache_key'] = cache_key
+        meta['page_num'] = int(page_num)
+        meta['saved_at'] = datetime.datetime.now().isoformat(timespec='seconds')
+        meta['html_bytes'] = os.path.getsize(html_path)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        print(f"ページ {page_num}: キャッシュに保存しました。'{html_path}'")
+        return True
+    except OSError as e:
+        print(f"ページ {page_num}: キャッシュ保存エラー: {e}")
+        return False
+
+def finish_cache_recording(cache_dir, cache_key, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+    """
+    記録中の一時ディレクトリを記録済みページとして確定する。
+    1ページ目が保存されている場合のみ既存の記録を置き換え、保存されていなければ既存の記録を残す。
+    確定後、キャッシュ全体が max_bytes を超えていれば他のキャッシュキーを古い順に削除する (Noneで無制限)。
+    戻り値: 確定したページ数 (確定しなかった場合は 0)
+    """
+    staging_dir = _cache_staging_dir(cache_dir, cache_key)
+    key_dir = _cache_key_dir(cache_dir, cache_key)
+    page_count = 0
+    while os.path.exists(os.path.join(staging_dir, _cache_page_basename(page_count + 1) + ".html")):
+        page_count += 1
+
+    if page_count == 0:
+        print(f"キャッシュ '{cache_key}' に保存されたページがないため、既存の記録を保持します。")
+        discard_cache_recording(cache_dir, cache_key)
+        return 0
+
+    manifest = {
+        'cache_key': cache_key,
+        'page_count': page_count,
+        'recorded_at': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    try:
+        with open(os.path.join(staging_dir, CACHE_MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        if os.path.isdir(key_dir):
+            rmtree(key_dir)
+        os.replace(staging_dir, key_dir)
+        os.utime(key_dir, None)
+    except OSError as e:
+        print(f"キャッシュ '{cache_key}' の記録確定エラー: {e}")
+        traceback.print_exc()
+        return 0
+    print(f"キャッシュ '{cache_key}' の記録を確定しました。({page_count} ページ) '{key_dir}'")
+
+    if max_bytes is not None:
+        evict_cache_if_needed(cache_dir, max_bytes, keep_keys=(cache_key,))
+    return page_count
+
+def discard_cache_recording(cache_dir, cache_key):
+    """
+    記録中の一時ディレクトリを破棄する。既存の記録済みページは変更しない。
+    中断・エラー時など、記録を確定すべきでない場合に使用する。
+    """
+    staging_dir = _cache_staging_dir(cache_dir, cache_key)
+    if not os.path.isdir(staging_dir):
+        return
+    try:
+        rmtree(staging_dir)
+    except OSError as e:
+        print(f"キャッシュ '{cache_key}' の一時ディレクトリ削除エラー: {e}")
+
+def load_cache_manifest(cache_dir, cache_key):
+    """
+    記録済みキャッシュキーのマニフェスト (ページ数など) を読み込む。
+    記録が存在しない場合は None
+    """
+    manifest_path = os.path.join(_cache_key_dir(cache_dir, cache_key), CACHE_MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"キャッシュ '{cache_key}' のマニフェスト読み込みエラー: {e}")
+        return None
+
+def load_page_from_cache(cache_dir, cache_key, page_num):
+    """
+    記録済みキャッシュからページのHTMLとメタデータを読み込む。
+    戻り値: (html, metadata)。キャッシュが存在しない場合は (None, None)
+    """
+    key_dir = _cache_key_dir(cache_dir, cache_key)
+    base_path = os.path.join(key_dir, _cache_page_basename(page_num))
+    html_path, meta_path = base_path + ".html", base_path + ".json"
+    if not os.path.exists(html_path):
+        return None, None
+    try:
+        with open(html_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        metadata = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        # キャッシュキーの最終利用時刻を更新し、削除対象の判定 (古い順) に反映させる
+        os.utime(key_dir, None)
+        return html, metadata
+    except (OSError, ValueError) as e:
+        print(f"ページ {page_num}: キャッシュ読み込みエラー: {e}")
+        return None, None
+
+def evict_cache_if_needed(cache_dir, max_bytes, keep_keys=()):
+    """
+    キャッシュ全体のサイズが max_bytes を超えている場合、最終利用時刻の古いキャッシュキーから
+    ディレクトリ単位で削除する。記録中の一時ディレクトリは対象外。
+    keep_keys: 削除対象から除外するキャッシュキー (直前に記録したキーなど)
+    戻り値: 削除したキャッシュキー数
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    keep_dir_names = {cache_key_dir_name(key) for key in keep_keys}
+    key_dirs = []
+    total_bytes = 0
+    for name in os.listdir(cache_dir):
+        key_dir = os.path.join(cache_dir, name)
+        if name == CACHE_STAGING_DIR_NAME or not os.path.isdir(key_dir):
+            continue
+        size = 0
+        for root, _, files in os.walk(key_dir):
+            size += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        total_bytes += size
+        key_dirs.append((os.path.getmtime(key_dir), name, key_dir, size))
+
+    evicted = 0
+    for _, name, key_dir, size in sorted(key_dirs):
+        if total_bytes <= max_bytes:
+            break
+        if name in keep_dir_names:
+            continue
+        rmtree(key_dir)
+        total_bytes -= size
+        evicted += 1
+        print(f"キャッシュ削除: '{key_dir}'")
+    if evicted:
+        print(f"キャッシュサイズ上限 ({max_bytes} バイト) を超えたため、古いキャッシュキーを {evicted} 件削除しました。")
+    return evicted
+
+# --- コマンドライン引数関連 ---
+def int_at_least(minimum):
+    """argparse用: minimum 以上の整数を受け付ける type 関数を返す。"""
+    def parse(value):
+        try:
+            number = int(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"整数を指定してください: '{value}'")
+        if number < minimum:
+            raise argparse.ArgumentTypeError(f"{minimum}以上を指定してください: {number}")
+        return number
+    return parse
+
 # --- Seleniumユーティリティ ---
 def wait_for_element_presence(driver, by, value, timeout=DEFAULT_PAGE_LOAD_TIMEOUT):
     """指定された要素がDOM上に現れるまで待機する"""
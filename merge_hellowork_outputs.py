@@ -0,0 +1,57 @@
+import os
+import sys
+import argparse
+import datetime
+import time
+
+# 汎用ユーティリティのインポート
+import generic_scraper_utils as gsu
+from scraping_hellowork import OUTPUT_DIR_NAME, format_date_jp_to_iso
+
+# --- ハローワーク統合処理の設定 ---
+MERGE_KEY_COLUMN = '求人番号' # 重複排除のキー
+MERGE_ORDER_COLUMN = '受付年月日' # 重複時はこの日付が最も新しい行を残す
+MERGED_FILENAME_BASE = "hellowork_jobs_merged"
+
+# --- メイン処理のエントリポイント ---
+if __name__ == "__main__":
+    script_overall_start_time = time.time()
+
+    parser = argparse.ArgumentParser(description='複数回の実行・分割で出力されたハローワーク求人CSVを、求人番号で重複排除して1つのファイルに統合します。')
+    parser.add_argument('inputs', nargs='+', metavar='CSV', help='統合する hellowork_jobs_list.csv などの入力ファイル')
+    parser.add_argument('-o', '--output', help=f'出力ファイルパス (デフォルト: {OUTPUT_DIR_NAME}/{MERGED_FILENAME_BASE}.csv または .parquet)')
+    parser.add_argument('--format', choices=['csv', 'parquet'], help='出力形式。省略時は出力ファイルの拡張子から判定します (デフォルト: csv)')
+    parser.add_argument('--chunk-rows', type=gsu.int_at_least(1), default=gsu.DEFAULT_MERGE_CHUNK_ROWS, metavar='ROWS', help=f'一度にメモリへ読み込む最大行数 (デフォルト: {gsu.DEFAULT_MERGE_CHUNK_ROWS})')
+    parser.add_argument('--max-open-runs', type=gsu.int_at_least(2), default=gsu.DEFAULT_MERGE_MAX_OPEN_RUNS, metavar='N', help=f'同時に開く一時ファイルの最大数。2以上 (デフォルト: {gsu.DEFAULT_MERGE_MAX_OPEN_RUNS})')
+    parser.add_argument('--tmp-dir', help='一時ファイルの作成先ディレクトリ (デフォルト: OSの一時ディレクトリ)')
+    args = parser.parse_args()
+
+    output_format = args.format
+    if output_format is None:
+        output_format = 'parquet' if args.output and args.output.lower().endswith('.parquet') else 'csv'
+    output_path = args.output
+    if output_path is None:
+        output_abs_dir = gsu.ensure_output_dir(OUTPUT_DIR_NAME)
+        output_path = os.path.join(output_abs_dir, f"{MERGED_FILENAME_BASE}.{output_format}")
+
+    print(f"{len(args.inputs)} 個のファイルを統合します。出力先: '{output_path}' ({output_format})")
+    print(f"重複排除キー: {MERGE_KEY_COLUMN} (重複時は {MERGE_ORDER_COLUMN} が最新の行を残します)")
+
+    written = gsu.external_merge_dedup(
+        args.inputs,
+        output_path,
+        key_column=MERGE_KEY_COLUMN,
+        order_column=MERGE_ORDER_COLUMN,
+        order_func=format_date_jp_to_iso,
+        output_format=output_format,
+        chunk_rows=args.chunk_rows,
+        max_open_runs=args.max_open_runs,
+        tmp_dir=args.tmp_dir
+    )
+
+    overall_duration = time.time() - script_overall_start_time
+    if written is None:
+        print("\nファイルの統合に失敗しました。")
+        print(f"スクリプト全体の実行時間: {datetime.timedelta(seconds=int(overall_duration))}")
+        sys.exit(1)
+    print(f"スクリプト全体の実行時間: {datetime.timedelta(seconds=int(overall_duration))}")
@@ -17,6 +17,7 @@ ENABLE_CLEANSING = True
 OUTPUT_DIR_NAME = "output"  # ハローワーク専用の出力ディレクトリ名
 CSV_FILENAME = "hellowork_jobs_list.csv"
 EXCEL_FILENAME = "hellowork_jobs_list.xlsx"
+REPLAY_FILENAME_BASE = "hellowork_jobs_list_replay" # キャッシュ再生時の出力ファイル名 (ライブ取得の出力を上書きしないよう別名にする)
 INITIAL_PAGE_URL = "https://www.hellowork.mhlw.go.jp/kensaku/GECA110010.do?action=initDisp&screenId=GECA110010"
 PAGE_LOAD_TIMEOUT = gsu.DEFAULT_PAGE_LOAD_TIMEOUT # 汎用ユーティリティのデフォルト値を使用
 REQUEST_WAIT_TIME = gsu.DEFAULT_REQUEST_WAIT_TIME # 汎用ユーティリティのデフォルト値を使用
@@ -47,6 +48,20 @@ COLUMNS_ORDER_ORIGINAL = [
     '求人票リンク', '詳細リンク'
 ]
 
+# --- 日付変換関数 (ハローワーク特有) ---
+def format_date_jp_to_iso(date_jp_str):
+    """'2024年5月1日' 形式の日付文字列を 'YYYY-MM-DD' 形式に変換する。変換できない場合は None"""
+    if not date_jp_str or not isinstance(date_jp_str, str): return None
+    match = re.match(r'(\d+)年(\d+)月(\d+)日', date_jp_str)
+    if match:
+        try:
+            year, month, day = map(int, match.groups())
+            if year < 100: year += 2000
+            dt_obj = datetime.date(year, month, day)
+            return dt_obj.strftime('%Y-%m-%d')
+        except ValueError: return None
+    return None
+
 # --- データクレンジング関数 (ハローワーク特有) ---
 def clean_job_data_for_hellowork(job_data):
     """
@@ -210,17 +225,6 @@ def clean_job_data_for_hellowork(job_data):
     # --- 受付年月日, 紹介期限日 ---
     cleaned_data['受付年月日_YYYYMMDD'] = None
     cleaned_data['紹介期限日_YYYYMMDD'] = None
-    def format_date_jp_to_iso(date_jp_str):
-        if not date_jp_str or not isinstance(date_jp_str, str): return None
-        match = re.match(r'(\d+)年(\d+)月(\d+)日', date_jp_str)
-        if match:
-            try:
-                year, month, day = map(int, match.groups())
-                if year < 100: year += 2000
-                dt_obj = datetime.date(year, month, day)
-                return dt_obj.strftime('%Y-%m-%d')
-            except ValueError: return None
-        return None
     cleaned_data['受付年月日_YYYYMMDD'] = format_date_jp_to_iso(cleaned_data.get('受付年月日'))
     cleaned_data['紹介期限日_YYYYMMDD'] = format_date_jp_to_iso(cleaned_data.get('紹介期限日'))
 
@@ -304,10 +308,58 @@ def extract_job_data_from_hellowork_table(table_soup, base_url_for_links):
     return job_data
 
 
+# --- 1ページ分のHTMLを処理する関数 (ハローワーク特有) ---
+def process_hellowork_page_html(html, page_url, page_count, output_csv_filepath):
+    """
+    検索結果ページのHTMLから求人データを抽出し、CSVに追記する。
+    ライブ取得・キャッシュ再生のどちらからも呼び出される。
+    戻り値: 抽出件数。求人テーブルが無いなど、処理を終了すべき場合は None
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    no_data_message = soup.find("div", class_="msg_disp_info", string=lambda t: t and "ご指定の条件に該当する求人はありませんでした" in t)
+    if no_data_message and page_count == 1 :
+        print("検索結果0件でした。")
+        return None
+
+    job_tables = soup.find_all('table', class_='kyujin mt1 noborder') # ハローワーク特有のセレクタ
+    current_page_data = []
+
+    if not job_tables and page_count == 1:
+        print(f"ページ1 ({page_url}) で求人情報テーブルが見つかりませんでした。")
+        return None
+    elif not job_tables:
+        print(f"ページ {page_count} ({page_url}): 求人テーブルなし。処理終了。")
+        return None
+
+    print(f"ページ {page_count}: {len(job_tables)} 件検出。抽出開始...")
+    current_page_extracted_count = 0
+    for table in job_tables:
+        job_data = extract_job_data_from_hellowork_table(table, page_url)
+        if job_data:
+            if ENABLE_CLEANSING:
+                try:
+                    job_data = clean_job_data_for_hellowork(job_data)
+                except Exception as e_clean:
+                    print(f"!! 求人番号 {job_data.get('求人番号', '不明')} のクレンジング中にエラー: {e_clean}")
+                    traceback.print_exc()
+            current_page_data.append(job_data)
+            current_page_extracted_count += 1
+    print(f"ページ {page_count}: {current_page_extracted_count} 件抽出完了。")
+
+    cols_order = COLUMNS_ORDER_CLEANSED if ENABLE_CLEANSING else COLUMNS_ORDER_ORIGINAL
+    gsu.append_data_to_csv(current_page_data, output_csv_filepath, columns_order=cols_order, page_num=page_count)
+    return current_page_extracted_count
+
+
 # --- Seleniumを使ったメインスクレイピング関数 (ハローワーク特有) ---
-def scrape_hellowork_after_manual_search(initial_page_url, output_dir, max_pages=None):
+def scrape_hellowork_after_manual_search(initial_page_url, output_dir, max_pages=None,
+                                         cache_key=None, cache_dir=gsu.DEFAULT_CACHE_DIR_NAME,
+                                         cache_max_bytes=gsu.DEFAULT_CACHE_MAX_BYTES):
     """
     ユーザーがハローワークサイトで検索操作を行った後、その状態を引き継いでスクレイピングを開始する。
+    cache_key を指定すると記録モードとなり、取得した各ページを cache_dir に保存する。
+    既存の記録は、ページ送りが正常に終了し、全ページの保存に成功した場合にのみ置き換えられる。
     """
     all_extracted_jobs_count = 0
     output_csv_filepath = os.path.join(output_dir, CSV_FILENAME)
@@ -319,6 +371,8 @@ def scrape_hellowork_after_manual_search(initial_page_url, output_dir, max_pages
         return 0, None, None
 
     processing_start_time = None
+    finished_normally = False # 最大ページ到達・最終ページ到達など、ページ送りが正常に終了したか
+    recording_failed = False # キャッシュ記録中にページの保存に失敗したか
     script_overall_start_time_ref = time.time() # ドライバー起動前の時刻を記録
 
     try:
@@ -334,11 +388,14 @@ def scrape_hellowork_after_manual_search(initial_page_url, output_dir, max_pages
 
         processing_start_time = time.time()
         print(f"[{datetime.timedelta(seconds=0)}] ユーザー操作完了、スクレイピングを開始します。")
+        if cache_key is not None:
+            gsu.start_cache_recording(cache_dir, cache_key)
 
         page_count = 1
         while True:
             if max_pages is not None and page_count > max_pages:
                 print(f"\n指定された最大ページ数 ({max_pages}) に達したため、処理を終了します。")
+                finished_normally = True
                 break
 
             page_loop_start_time = time.time()
@@ -360,43 +417,22 @@ def scrape_hellowork_after_manual_search(initial_page_url, output_dir, max_pages
                 break
 
             current_html_content = driver.page_source
-            soup = BeautifulSoup(current_html_content, 'html.parser')
             current_page_url = driver.current_url
 
-            no_data_message = soup.find("div", class_="msg_disp_info", string=lambda t: t and "ご指定の条件に該当する求人はありませんでした" in t)
-            if no_data_message and page_count == 1 :
-                print("検索結果0件でした。")
-                break
-
-            job_tables = soup.find_all('table', class_='kyujin mt1 noborder') # ハローワーク特有のセレクタ
-            current_page_data = []
-
-            if not job_tables and page_count == 1:
-                print(f"ページ1 ({current_page_url}) で求人情報テーブルが見つかりませんでした。")
+            if cache_key is not None and not recording_failed:
+                if not gsu.save_page_to_cache(
+                    cache_dir, cache_key, page_count, current_html_content,
+                    metadata={'url': current_page_url}
+                ):
+                    recording_failed = True
+                    print(f"ページ {page_count} を保存できなかったため、キャッシュ '{cache_key}' の記録を中止します (スクレイピングは続行)。")
+
+            current_page_extracted_count = process_hellowork_page_html(current_html_content, current_page_url, page_count, output_csv_filepath)
+            if current_page_extracted_count is None:
+                finished_normally = True
                 break
-            elif not job_tables:
-                print(f"ページ {page_count} ({current_page_url}): 求人テーブルなし。処理終了。")
-                break
-
-            print(f"ページ {page_count}: {len(job_tables)} 件検出。抽出開始...")
-            current_page_extracted_count = 0
-            for table in job_tables:
-                job_data = extract_job_data_from_hellowork_table(table, current_page_url)
-                if job_data:
-                    if ENABLE_CLEANSING:
-                        try:
-                            job_data = clean_job_data_for_hellowork(job_data)
-                        except Exception as e_clean:
-                            print(f"!! 求人番号 {job_data.get('求人番号', '不明')} のクレンジング中にエラー: {e_clean}")
-                            traceback.print_exc()
-                    current_page_data.append(job_data)
-                    current_page_extracted_count += 1
-            print(f"ページ {page_count}: {current_page_extracted_count} 件抽出完了。")
             all_extracted_jobs_count += current_page_extracted_count
 
-            cols_order = COLUMNS_ORDER_CLEANSED if ENABLE_CLEANSING else COLUMNS_ORDER_ORIGINAL
-            gsu.append_data_to_csv(current_page_data, output_csv_filepath, columns_order=cols_order, page_num=page_count)
-
             page_loop_end_time = time.time()
             print(f"ページ {page_count} 処理完了 (所要時間: {page_loop_end_time - page_loop_start_time:.2f}秒)")
 
@@ -418,6 +454,7 @@ def scrape_hellowork_after_manual_search(initial_page_url, output_dir, max_pages
                 else:
                     elapsed_at_end = int(time.time() - processing_start_time)
                     print(f"\n[{datetime.timedelta(seconds=elapsed_at_end)}] クリック可能な「次へ」ボタンが見つかりません。全ページ処理完了。")
+                    finished_normally = True
                     break
             except Exception as e_next:
                 print(f"「次へ」ボタン処理中に予期せぬエラー: {e_next}")
@@ -436,10 +473,80 @@ def scrape_hellowork_after_manual_search(initial_page_url, output_dir, max_pages
         elapsed_total = int(time.time() - final_log_start_time)
         print(f"[{datetime.timedelta(seconds=elapsed_total)}] 処理終了シーケンス開始。")
         gsu.close_webdriver(driver)
+        if cache_key is not None and processing_start_time is not None:
+            if finished_normally and not recording_failed:
+                gsu.finish_cache_recording(cache_dir, cache_key, max_bytes=cache_max_bytes)
+            else:
+                reason = "保存に失敗したページがある" if recording_failed else "処理が正常に終了しなかった"
+                print(f"{reason}ため、キャッシュ '{cache_key}' の記録を破棄し、既存の記録を保持します。")
+                gsu.discard_cache_recording(cache_dir, cache_key)
 
     return all_extracted_jobs_count, output_csv_filepath, processing_start_time
 
 
+# --- キャッシュ再生によるスクレイピング関数 (開発・回帰確認用) ---
+def replay_output_filepath(output_dir, cache_key, extension):
+    """キャッシュ再生時の出力ファイルパス (例: hellowork_jobs_list_replay_<KEY>.csv) を返す。"""
+    return os.path.join(output_dir, f"{REPLAY_FILENAME_BASE}_{gsu.cache_key_dir_name(cache_key)}{extension}")
+
+def replay_hellowork_from_cache(output_dir, cache_key, cache_dir=gsu.DEFAULT_CACHE_DIR_NAME, max_pages=None):
+    """
+    記録モードで保存したページをキャッシュから読み込み、WebDriverを使わずに抽出処理を行う。
+    ライブ取得の出力を上書きしないよう、replay_output_filepath() のファイルに出力する。
+    記録済みのページが欠けている場合はエラーとし、途中までの出力は削除する。
+    """
+    manifest = gsu.load_cache_manifest(cache_dir, cache_key)
+    if manifest is None:
+        print(f"エラー: キャッシュ '{cache_key}' の記録が見つかりません。先に --record-cache で記録してください。")
+        return 0, None, None
+    recorded_page_count = manifest.get('page_count', 0)
+
+    all_extracted_jobs_count = 0
+    output_csv_filepath = replay_output_filepath(output_dir, cache_key, '.csv')
+
+    gsu.delete_file_if_exists(output_csv_filepath)
+
+    processing_start_time = time.time()
+    print(f"[{datetime.timedelta(seconds=0)}] キャッシュ '{cache_key}' の再生を開始します。")
+
+    page_count = 1
+    while True:
+        if max_pages is not None and page_count > max_pages:
+            print(f"\n指定された最大ページ数 ({max_pages}) に達したため、処理を終了します。")
+            break
+
+        if page_count > recorded_page_count:
+            print(f"\nキャッシュ済みページ ({recorded_page_count} ページ) を全て処理しました。")
+            break
+
+        html, metadata = gsu.load_page_from_cache(cache_dir, cache_key, page_count)
+        if html is None:
+            print(f"エラー: キャッシュ '{cache_key}' のページ {page_count} が見つかりません (記録済み: {recorded_page_count} ページ)。")
+            print("キャッシュが破損しています。--record-cache で再記録してください。")
+            gsu.delete_file_if_exists(output_csv_filepath)
+            return 0, None, None
+
+        print(f"\n--- ページ {page_count} (キャッシュ){' [最大: '+str(max_pages)+']' if max_pages else ''} ---")
+        page_url = metadata.get('url') or INITIAL_PAGE_URL
+        current_page_extracted_count = process_hellowork_page_html(html, page_url, page_count, output_csv_filepath)
+        if current_page_extracted_count is None:
+            break
+        all_extracted_jobs_count += current_page_extracted_count
+        page_count += 1
+
+    return all_extracted_jobs_count, output_csv_filepath, processing_start_time
+
+
+# --- コマンドライン引数の検証 ---
+def cache_key_arg(value):
+    """argparse用: キャッシュキーとして使用できる値か検証する。"""
+    try:
+        gsu.cache_key_dir_name(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
 # --- メイン処理のエントリポイント ---
 if __name__ == "__main__":
     script_overall_start_time = time.time() # スクリプト全体の開始時刻
@@ -447,6 +554,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='ハローワーク求人情報をSeleniumでスクレイピングします（ユーザー検索後）。')
     parser.add_argument('--debug', type=int, metavar='PAGES', help='デバッグモード。指定ページ数で処理を停止 (例: --debug 3)')
     parser.add_argument('--no-clean', action='store_true', help='データクレンジングを実行しない場合に指定します。')
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument('--record-cache', type=cache_key_arg, metavar='KEY', help='記録モード。取得した各ページを検索名 KEY でキャッシュに保存します。')
+    cache_group.add_argument('--replay-cache', type=cache_key_arg, metavar='KEY', help='再生モード。ブラウザを起動せず、KEY で記録したページをキャッシュから処理します。')
+    parser.add_argument('--cache-dir', default=gsu.DEFAULT_CACHE_DIR_NAME, help=f'ページキャッシュの保存先 (デフォルト: {gsu.DEFAULT_CACHE_DIR_NAME})')
+    parser.add_argument('--cache-max-mb', type=gsu.int_at_least(1), default=gsu.DEFAULT_CACHE_MAX_BYTES // (1024 * 1024), metavar='MB', help='ページキャッシュの最大合計サイズ (MB)。超えた分は最終利用の古い検索 (KEY) 単位で削除します。')
     args = parser.parse_args()
 
     # グローバル変数 ENABLE_CLEANSING をargsに基づいて更新
@@ -462,11 +574,25 @@ if __name__ == "__main__":
     if args.debug:
         print(f"★★★ デバッグモード: 最大 {args.debug} ページまで処理します ★★★")
 
-    total_jobs, final_csv_path, actual_processing_start_time = scrape_hellowork_after_manual_search(
-        INITIAL_PAGE_URL,
-        output_abs_dir,
-        max_pages=args.debug
-    )
+    if args.replay_cache:
+        print(f"★★★ 再生モード: キャッシュ '{args.replay_cache}' を使用します ★★★")
+        total_jobs, final_csv_path, actual_processing_start_time = replay_hellowork_from_cache(
+            output_abs_dir,
+            args.replay_cache,
+            cache_dir=args.cache_dir,
+            max_pages=args.debug
+        )
+    else:
+        if args.record_cache:
+            print(f"★★★ 記録モード: 取得ページをキャッシュ '{args.record_cache}' に保存します ★★★")
+        total_jobs, final_csv_path, actual_processing_start_time = scrape_hellowork_after_manual_search(
+            INITIAL_PAGE_URL,
+            output_abs_dir,
+            max_pages=args.debug,
+            cache_key=args.record_cache,
+            cache_dir=args.cache_dir,
+            cache_max_bytes=args.cache_max_mb * 1024 * 1024
+        )
 
     if total_jobs > 0 and final_csv_path and os.path.exists(final_csv_path):
         if actual_processing_start_time: # スクレイピング処理が実際に開始された場合
@@ -479,7 +605,10 @@ if __name__ == "__main__":
         print(f"ファイルパス: '{os.path.abspath(final_csv_path)}'")
 
         if CONVERT_CSV_TO_EXCEL:
-            excel_filepath = os.path.join(output_abs_dir, EXCEL_FILENAME)
+            if args.replay_cache:
+                excel_filepath = replay_output_filepath(output_abs_dir, args.replay_cache, '.xlsx')
+            else:
+                excel_filepath = os.path.join(output_abs_dir, EXCEL_FILENAME)
             cols_order_excel = COLUMNS_ORDER_CLEANSED if ENABLE_CLEANSING else COLUMNS_ORDER_ORIGINAL
             gsu.convert_csv_to_excel(final_csv_path, excel_filepath, columns_order=cols_order_excel)
 